@@ -2,28 +2,88 @@
 
 from __future__ import annotations
 
-import json
+import asyncio
+import io
 import logging
-import time
-from typing import Dict, List, Optional, Set, Tuple
+import re
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 
-from openai import OpenAI
-import psycopg
+import asyncpg
+import httpx
+import openai
+import orjson
+import xxhash
+from openai import AsyncOpenAI
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 from .config import CollectorConfig, SQLValidationConfig
 
 LOGGER = logging.getLogger(__name__)
 
+# How many recently accepted questions are echoed back into the prompt so the
+# model avoids regenerating them.
+_RECENT_QUESTION_WINDOW = 20
 
-class SQLValidator:
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+_ALLOWED_FIRST_TOKENS = frozenset({"SELECT", "WITH"})
+_FIRST_TOKEN_RE = re.compile(r"\S+")
+
+
+def _question_hash(question: str) -> int:
+    """Return a compact 64-bit digest used for duplicate detection."""
+
+    return xxhash.xxh64_intdigest(question.encode("utf-8"))
+
+
+def _text_field(data: Dict[str, object], key: str) -> str:
+    """Fetch a field as stripped text without re-coercing existing strings."""
+
+    value = data.get(key)
+    if isinstance(value, str):
+        return value.strip()
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+class AsyncSQLValidator:
     """Validate generated SQL statements against a PostgreSQL database."""
 
     def __init__(self, config: SQLValidationConfig) -> None:
         if not config.database_url:
             raise ValueError("database_url must be provided when SQL validation is enabled")
         self._config = config
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    server_settings = None
+                    if self._config.search_path:
+                        server_settings = {"search_path": self._config.search_path}
+                    self._pool = await asyncpg.create_pool(
+                        dsn=self._config.database_url,
+                        min_size=2,
+                        max_size=8,
+                        server_settings=server_settings,
+                    )
+        return self._pool
 
-    def validate(self, query: str) -> Tuple[bool, str]:
+    async def validate(self, query: str) -> Tuple[bool, str]:
         statement = query.strip()
         if not statement:
             return False, "생성된 SQL이 비어 있습니다."
@@ -32,24 +92,21 @@ class SQLValidator:
         if ";" in statement:
             return False, "하나의 SQL 문장만 생성해 주세요."
 
-        tokens = statement.split()
-        first_token = tokens[0].upper() if tokens else ""
-        if first_token not in {"SELECT", "WITH"}:
+        match = _FIRST_TOKEN_RE.search(statement)
+        first_token = match.group().upper() if match else ""
+        if first_token not in _ALLOWED_FIRST_TOKENS:
             return False, "데이터 조회용 SELECT 혹은 WITH 문만 지원합니다."
 
         try:
-            with psycopg.connect(self._config.database_url) as conn:
-                with conn.cursor() as cursor:
-                    if self._config.search_path:
-                        cursor.execute(f"SET search_path TO {self._config.search_path}")
+            pool = await self._get_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
                     if self._config.statement_timeout_ms:
-                        cursor.execute(
-                            "SET LOCAL statement_timeout = %s",
-                            (int(self._config.statement_timeout_ms),),
+                        await conn.execute(
+                            f"SET LOCAL statement_timeout = {int(self._config.statement_timeout_ms)}"
                         )
-                    cursor.execute("EXPLAIN (FORMAT JSON) " + statement)
-                    cursor.fetchall()
-        except psycopg.Error as exc:  # pragma: no cover - requires DB connection
+                    await conn.fetch("EXPLAIN (FORMAT JSON) " + statement)
+        except (asyncpg.PostgresError, OSError) as exc:  # pragma: no cover - requires DB connection
             return False, str(exc).strip()
 
         return True, ""
@@ -60,103 +117,335 @@ class DatasetCollector:
 
     def __init__(self, config: CollectorConfig) -> None:
         self.config = config
-        self._client = OpenAI(api_key=config.openai.api_key)
+        # HTTP/2 multiplexes the concurrent requests over a few kept-alive
+        # connections instead of churning TCP+TLS handshakes.
+        self._client = AsyncOpenAI(
+            api_key=config.openai.api_key,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(60.0),
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            ),
+        )
         self._max_retries = max(config.openai.max_retries, 1)
-        self._sql_validator: Optional[SQLValidator] = None
+        self._backoff_wait = wait_exponential_jitter(initial=1, max=60)
+        self._retryer = AsyncRetrying(
+            stop=stop_after_attempt(self._max_retries),
+            wait=self._retry_wait,
+            retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+            reraise=True,
+        )
+        self._instruction = config.dataset.instruction.strip()
+        self._items_per_call = max(config.openai.items_per_call, 1)
+        # The configured bound is per item; each call returns items_per_call items.
+        self._max_output_tokens = max(config.openai.max_output_tokens, 1) * self._items_per_call
+        self._prompt_prefix = self._build_prompt_prefix()
+        self._output_format = self._build_output_format()
+        self._checkpoint_path = config.dataset.output_path.with_suffix(".jsonl")
+        self._sql_validator: Optional[AsyncSQLValidator] = None
         if (
             self.config.dataset.mode == "sql"
             and self.config.sql.validation.enabled
         ):
             try:
-                self._sql_validator = SQLValidator(self.config.sql.validation)
+                self._sql_validator = AsyncSQLValidator(self.config.sql.validation)
             except ValueError as exc:
                 LOGGER.warning("SQL validator disabled: %s", exc)
 
     def collect(self) -> List[Dict[str, str]]:
         """Collect the dataset items using the configured GPT model."""
 
-        results: List[Dict[str, str]] = []
-        seen_questions: Set[str] = set()
+        if self.config.openai.use_batch_api:
+            return asyncio.run(self._collect_via_batch())
+        return asyncio.run(self._collect_async())
+
+    async def _collect_async(self) -> List[Dict[str, str]]:
+        results = self._load_checkpoint()
+        seen_hashes: Set[int] = {
+            _question_hash(item.get("question", "").strip()) for item in results
+        }
         target_size = self.config.dataset.size
-        consecutive_failures = 0
+        concurrency = max(self.config.openai.concurrency, 1)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        items_per_call = self._items_per_call
+        recent_questions: deque = deque(
+            (item.get("question", "").strip() for item in results),
+            maxlen=_RECENT_QUESTION_WINDOW,
+        )
+
+        # Pre-size the list so accepted items are assigned in place instead of
+        # growing the backing array throughout the run.
+        collected = len(results)
+        if collected < target_size:
+            results.extend([None] * (target_size - collected))
 
-        while len(results) < target_size:
-            prompt = self._build_prompt(index=len(results) + 1)
+        async def _worker(index: int) -> List[Dict[str, str]]:
+            prompt = self._build_prompt(index=index, recent_questions=tuple(recent_questions))
             LOGGER.debug("Generated prompt: %s", prompt)
 
-            try:
-                payload = self._call_model(prompt)
-                consecutive_failures = 0
-            except Exception as exc:  # pragma: no cover - network failure handling
-                consecutive_failures += 1
-                LOGGER.warning("Model call failed (%s/%s): %s", consecutive_failures, self._max_retries, exc)
-                if consecutive_failures >= self._max_retries:
-                    raise
-                time.sleep(2.0)
-                continue
+            async with semaphore:
+                payload = await self._call_model(prompt)
 
             try:
-                item = self._parse_payload(payload)
+                items = self._parse_payload(payload)
             except ValueError as exc:
                 LOGGER.warning("Skipping unparsable payload: %s", exc)
-                continue
-            question = item.get("question", "").strip()
-            if not question:
-                LOGGER.debug("Skipping empty question payload: %s", payload)
-                continue
-            if question in seen_questions:
-                LOGGER.info("Duplicate question detected, retrying: %s", question)
-                continue
-
-            seen_questions.add(question)
-            results.append(item)
+                return []
+            await self._annotate_sql_items(items)
+            return items
+
+        with self._open_checkpoint() as checkpoint:
+            while collected < target_size:
+                remaining = target_size - collected
+                call_count = min(-(-remaining // items_per_call), concurrency)
+                batches = await asyncio.gather(
+                    *[
+                        _worker(collected + offset * items_per_call + 1)
+                        for offset in range(call_count)
+                    ]
+                )
+                for item in (item for batch in batches for item in batch):
+                    if collected >= target_size:
+                        break
+                    question = item.get("question", "").strip()
+                    if not question:
+                        LOGGER.debug("Skipping empty question payload: %s", item)
+                        continue
+                    question_hash = _question_hash(question)
+                    if question_hash in seen_hashes:
+                        LOGGER.info("Duplicate question detected, retrying: %s", question)
+                        continue
 
+                    seen_hashes.add(question_hash)
+                    recent_questions.append(question)
+                    results[collected] = item
+                    collected += 1
+                    self._append_checkpoint(checkpoint, item)
+
+        return results[:target_size]
+
+    def _load_checkpoint(self) -> List[Dict[str, str]]:
+        """Load previously collected items so an interrupted run can resume."""
+
+        if not self._checkpoint_path.exists():
+            return []
+        items: List[Dict[str, str]] = []
+        with open(self._checkpoint_path, "rb") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    items.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    LOGGER.warning("Skipping corrupt checkpoint line in %s", self._checkpoint_path)
+        if items:
+            LOGGER.info("Resuming from %s existing items in %s", len(items), self._checkpoint_path)
+        return items
+
+    def _open_checkpoint(self):
+        self._checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        return open(self._checkpoint_path, "ab")
+
+    @staticmethod
+    def _append_checkpoint(handle, item: Dict[str, str]) -> None:
+        handle.write(orjson.dumps(item))
+        handle.write(b"\n")
+        handle.flush()
+
+    async def _collect_via_batch(self) -> List[Dict[str, str]]:
+        target_size = self.config.dataset.size
+        results = self._load_checkpoint()
+        seen_hashes: Set[int] = {
+            _question_hash(item.get("question", "").strip()) for item in results
+        }
+        if len(results) >= target_size:
+            return results[:target_size]
+
+        existing = len(results)
+        request_count = -(-(target_size - existing) // self._items_per_call)
+        recent_questions = [
+            item.get("question", "").strip() for item in results[-_RECENT_QUESTION_WINDOW:]
+        ]
+        buffer = io.BytesIO()
+        for i in range(request_count):
+            request = {
+                "custom_id": f"item-{i}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {
+                    "model": self.config.openai.model,
+                    "input": self._build_prompt(
+                        index=existing + i * self._items_per_call + 1,
+                        recent_questions=recent_questions,
+                    ),
+                    "temperature": self.config.openai.temperature,
+                    "max_output_tokens": self._max_output_tokens,
+                    "text": {"format": self._output_format},
+                },
+            }
+            buffer.write(orjson.dumps(request))
+            buffer.write(b"\n")
+        buffer.seek(0)
+
+        input_file = await self._client.files.create(
+            file=("batch_input.jsonl", buffer), purpose="batch"
+        )
+        batch = await self._client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+        LOGGER.info("Submitted batch %s with %s prompts", batch.id, request_count)
+
+        poll_interval = max(self.config.openai.batch_poll_interval_s, 1)
+        while batch.status not in {"completed", "failed", "expired", "cancelled"}:
+            await asyncio.sleep(poll_interval)
+            batch = await self._client.batches.retrieve(batch.id)
+            LOGGER.debug("Batch %s status: %s", batch.id, batch.status)
+        if batch.status != "completed":
+            raise RuntimeError(f"배치 작업이 {batch.status} 상태로 종료되었습니다: {batch.id}")
+
+        output = await self._client.files.content(batch.output_file_id)
+        with self._open_checkpoint() as checkpoint:
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                body = (record.get("response") or {}).get("body") or {}
+                payload = self._batch_output_text(body)
+                try:
+                    items = self._parse_payload(payload)
+                except ValueError as exc:
+                    LOGGER.warning("Skipping unparsable payload: %s", exc)
+                    continue
+                await self._annotate_sql_items(items)
+                for item in items:
+                    question = item.get("question", "").strip()
+                    if not question:
+                        continue
+                    question_hash = _question_hash(question)
+                    if question_hash in seen_hashes:
+                        continue
+                    seen_hashes.add(question_hash)
+                    results.append(item)
+                    self._append_checkpoint(checkpoint, item)
+                    if len(results) >= target_size:
+                        break
+                if len(results) >= target_size:
+                    break
+
+        if len(results) < target_size:
+            LOGGER.warning(
+                "Batch produced %s unique items out of %s requested", len(results), target_size
+            )
         return results
 
-    def _build_prompt(self, index: int) -> str:
+    @staticmethod
+    def _batch_output_text(body: Dict[str, object]) -> str:
+        parts: List[str] = []
+        for output_item in body.get("output", []) or []:
+            for content in output_item.get("content", []) or []:
+                text = content.get("text")
+                if text:
+                    parts.append(str(text))
+        return "".join(parts)
+
+    def _build_output_format(self) -> Dict[str, object]:
+        """Build the JSON-schema output format enforced on every model call."""
+
+        if self.config.dataset.mode == "sql":
+            keys = ["question", "generated_sql", "explanation"]
+        else:
+            keys = ["question", "answer", "context", "reference_title"]
+        item_schema = {
+            "type": "object",
+            "properties": {key: {"type": "string"} for key in keys},
+            "required": keys,
+            "additionalProperties": False,
+        }
+        return {
+            "type": "json_schema",
+            "name": "dataset_items",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "items": item_schema,
+                        "minItems": self._items_per_call,
+                        "maxItems": self._items_per_call,
+                    }
+                },
+                "required": ["items"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        }
+
+    def _build_prompt_prefix(self) -> str:
+        """Build the part of the prompt that is identical for every item."""
+
         dataset_cfg = self.config.dataset
         if dataset_cfg.mode == "sql":
-            table_guidance = ""
-            if self.config.sql.omop_tables:
-                table_list = "\n".join(f"  - {entry}" for entry in self.config.sql.omop_tables)
-                table_guidance = (
-                    "- 사용할 수 있는 OMOP CDM 테이블과 주요 컬럼 목록:\n"
-                    f"{table_list}\n"
-                    "- 위 목록에 없는 테이블이나 컬럼은 사용하지 마.\n"
-                )
             return (
                 "너는 의료 데이터베이스 전문가이자 SQL 튜터야. 아래 조건을 만족하는 학습 데이터를 생성해.\n"
                 f"- 주제: {dataset_cfg.base_topic}\n"
                 f"- 언어: {dataset_cfg.language}\n"
-                "- JSON 객체 하나만 출력해. 키는 question, generated_sql, explanation.\n"
                 "- question은 사용자가 자연어로 SQL을 요청하는 문장으로 작성해.\n"
                 "- generated_sql에는 질문을 해결하기 위한 실행 가능한 SQL 쿼리만 포함해.\n"
                 "- explanation에는 쿼리의 동작을 간단한 한국어 문장으로 설명해.\n"
                 "- question은 서로 중복되지 않도록 고유하게 작성해.\n"
                 "- 모든 테이블은 cdm.<table_name> 형태로 작성하고, 존재하는 컬럼만 사용해.\n"
-                f"{table_guidance}"
-                f"- 데이터 세트 내 인덱스: {index}.\n"
-                f"추가 지침: {dataset_cfg.instruction.strip()}"
+                f"{self.config.sql.table_guidance}"
             )
 
         return (
             "너는 전문 데이터 큐레이터야. 아래 조건을 만족하는 RAG 학습 데이터 항목을 생성해.\n"
             f"- 주제: {dataset_cfg.base_topic}\n"
             f"- 언어: {dataset_cfg.language}\n"
-            "- JSON 객체 하나만 출력해. 키는 question, answer, context, reference_title.\n"
             "- context는 RAG 검색이 반환할 수 있는 문단 형태로 작성해.\n"
             "- reference_title은 context에 해당하는 간단한 출처 제목으로 작성해.\n"
             "- question은 서로 중복되지 않도록 고유하게 작성해.\n"
             "- answer는 context를 근거로 명확하게 답해.\n"
+        )
+
+    def _build_prompt(self, index: int, recent_questions: Optional[Sequence[str]] = None) -> str:
+        prompt = (
+            f"{self._prompt_prefix}"
             f"- 데이터 세트 내 인덱스: {index}.\n"
-            f"추가 지침: {dataset_cfg.instruction.strip()}"
+            f"- 서로 다른 항목 {self._items_per_call}개를 items 배열로 출력해.\n"
         )
+        if recent_questions:
+            avoid_list = orjson.dumps(list(recent_questions)).decode("utf-8")
+            prompt += f"- 다음 질문들과 겹치지 않게 작성해: {avoid_list}\n"
+        return prompt + f"추가 지침: {self._instruction}"
 
-    def _call_model(self, prompt: str) -> str:
-        response = self._client.responses.create(
+    async def _call_model(self, prompt: str) -> str:
+        """Call the model, retrying transient API errors with backoff."""
+
+        return await self._retryer(self._request_model, prompt)
+
+    def _retry_wait(self, retry_state: RetryCallState) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        if isinstance(exc, openai.RateLimitError):
+            response = getattr(exc, "response", None)
+            retry_after = response.headers.get("retry-after") if response is not None else None
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return self._backoff_wait(retry_state)
+
+    async def _request_model(self, prompt: str) -> str:
+        response = await self._client.responses.create(
             model=self.config.openai.model,
             input=prompt,
             temperature=self.config.openai.temperature,
+            max_output_tokens=self._max_output_tokens,
+            text={"format": self._output_format},
         )
         if hasattr(response, "output_text"):
             return response.output_text
@@ -171,41 +460,47 @@ class DatasetCollector:
         except Exception as exc:  # pragma: no cover - defensive branch
             raise ValueError("Unexpected response format") from exc
 
-    def _parse_payload(self, payload: str) -> Dict[str, str]:
-        try:
-            data = json.loads(payload)
-        except json.JSONDecodeError:
-            LOGGER.debug("Payload was not pure JSON, attempting to extract JSON block.")
-            data = self._extract_json(payload)
+    def _parse_payload(self, payload: str) -> List[Dict[str, str]]:
+        data = orjson.loads(payload)
+        if isinstance(data, list):
+            entries = data
+        elif isinstance(data, dict) and "items" in data:
+            entries = data["items"]
+        else:
+            entries = [data]
+        return [self._parse_item(entry) for entry in entries if isinstance(entry, dict)]
+
+    def _parse_item(self, data: Dict[str, object]) -> Dict[str, str]:
         if self.config.dataset.mode == "sql":
-            generated_sql = data.get("generated_sql") or data.get("sql")
-            item = {
-                "question": str(data.get("question", "")).strip(),
-                "generated_sql": str(generated_sql or "").strip(),
-                "explanation": str(data.get("explanation", "")).strip(),
+            return {
+                "question": _text_field(data, "question"),
+                "generated_sql": _text_field(data, "generated_sql") or _text_field(data, "sql"),
+                "explanation": _text_field(data, "explanation"),
             }
-            item.update(self._validate_sql(item.get("generated_sql", "")))
-            return item
 
         return {
-            "question": str(data.get("question", "")).strip(),
-            "answer": str(data.get("answer", "")).strip(),
-            "context": str(data.get("context", "")).strip(),
-            "reference_title": str(data.get("reference_title", "")).strip(),
+            "question": _text_field(data, "question"),
+            "answer": _text_field(data, "answer"),
+            "context": _text_field(data, "context"),
+            "reference_title": _text_field(data, "reference_title"),
         }
 
-    def _extract_json(self, payload: str) -> Dict[str, str]:
-        start = payload.find("{")
-        end = payload.rfind("}")
-        if start == -1 or end == -1 or start >= end:
-            raise ValueError("응답에서 JSON 객체를 찾을 수 없습니다.")
-        return json.loads(payload[start : end + 1])
+    async def _annotate_sql_items(self, items: List[Dict[str, str]]) -> None:
+        """Attach validation columns to SQL items, validating concurrently."""
+
+        if self.config.dataset.mode != "sql" or not items:
+            return
+        annotations = await asyncio.gather(
+            *[self._validate_sql(item.get("generated_sql", "")) for item in items]
+        )
+        for item, annotation in zip(items, annotations):
+            item.update(annotation)
 
-    def _validate_sql(self, query: str) -> Dict[str, object]:
+    async def _validate_sql(self, query: str) -> Dict[str, object]:
         if not self._sql_validator:
             return {"sql_is_valid": None, "sql_validation_error": ""}
 
-        is_valid, message = self._sql_validator.validate(query)
+        is_valid, message = await self._sql_validator.validate(query)
         if not is_valid:
             LOGGER.warning("SQL validation failed: %s", message)
         return {
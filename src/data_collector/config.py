@@ -4,10 +4,15 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # pragma: no cover - libyaml not available
+    from yaml import SafeLoader as _YamlLoader
+
 
 DEFAULT_OMOP_TABLES = [
     "cdm.person(person_id, gender_concept_id, year_of_birth, race_concept_id, ethnicity_concept_id)",
@@ -31,6 +36,11 @@ class OpenAIConfig:
     model: str
     max_retries: int = 3
     temperature: float = 0.7
+    max_output_tokens: int = 800
+    concurrency: int = 8
+    items_per_call: int = 5
+    use_batch_api: bool = False
+    batch_poll_interval_s: int = 60
 
 
 @dataclass
@@ -61,6 +71,16 @@ class SQLConfig:
 
     omop_tables: List[str] = field(default_factory=list)
     validation: SQLValidationConfig = field(default_factory=SQLValidationConfig)
+    table_guidance: str = field(init=False, default="")
+
+    def __post_init__(self) -> None:
+        if self.omop_tables:
+            table_list = "\n".join(f"  - {entry}" for entry in self.omop_tables)
+            self.table_guidance = (
+                "- 사용할 수 있는 OMOP CDM 테이블과 주요 컬럼 목록:\n"
+                f"{table_list}\n"
+                "- 위 목록에 없는 테이블이나 컬럼은 사용하지 마.\n"
+            )
 
 
 @dataclass
@@ -73,7 +93,17 @@ class CollectorConfig:
 
     @classmethod
     def from_file(cls, path: str | Path) -> "CollectorConfig":
-        """Create the configuration from a YAML file."""
+        """Create the configuration from a YAML file.
+
+        Parsed configurations are cached on (path, mtime), so repeated
+        loads of an unchanged file skip the YAML parse entirely.
+        """
+
+        path = Path(path)
+        cache_key = (str(path), path.stat().st_mtime_ns)
+        cached = _CONFIG_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
 
         raw = _read_yaml(path)
         openai_section = raw.get("openai", {})
@@ -84,6 +114,11 @@ class CollectorConfig:
             model=openai_section.get("model", "gpt-4o-mini"),
             max_retries=int(openai_section.get("max_retries", 3)),
             temperature=float(openai_section.get("temperature", 0.7)),
+            max_output_tokens=int(openai_section.get("max_output_tokens", 800)),
+            concurrency=int(openai_section.get("concurrency", 8)),
+            items_per_call=int(openai_section.get("items_per_call", 5)),
+            use_batch_api=bool(openai_section.get("use_batch_api", False)),
+            batch_poll_interval_s=int(openai_section.get("batch_poll_interval_s", 60)),
         )
         dataset_cfg = DatasetConfig(
             size=int(dataset_section.get("size", 10)),
@@ -113,9 +148,14 @@ class CollectorConfig:
                 statement_timeout_ms=int(validation_section.get("statement_timeout_ms", 5000)),
             ),
         )
-        return cls(openai=openai_cfg, dataset=dataset_cfg, sql=sql_cfg)
+        config = cls(openai=openai_cfg, dataset=dataset_cfg, sql=sql_cfg)
+        _CONFIG_CACHE[cache_key] = config
+        return config
+
+
+_CONFIG_CACHE: Dict[Tuple[str, int], CollectorConfig] = {}
 
 
 def _read_yaml(path: str | Path) -> Dict[str, Any]:
     with open(path, "r", encoding="utf-8") as handle:
-        return yaml.safe_load(handle) or {}
+        return yaml.load(handle, Loader=_YamlLoader) or {}
@@ -3,9 +3,9 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Iterable, Mapping
+from typing import Iterable, List, Mapping
 
-import pandas as pd
+import xlsxwriter
 
 
 class ExcelWriter:
@@ -17,9 +17,21 @@ class ExcelWriter:
 
     def write(self, rows: Iterable[Mapping[str, str]]) -> Path:
         target_path = self._resolve_path()
-        frame = pd.DataFrame(rows)
-        frame.index += 1
-        frame.to_excel(target_path, index=True, index_label="row")
+        workbook = xlsxwriter.Workbook(
+            target_path, {"constant_memory": True, "strings_to_urls": False}
+        )
+        worksheet = workbook.add_worksheet()
+        try:
+            headers: List[str] = []
+            for row_number, item in enumerate(rows, 1):
+                if not headers:
+                    headers = list(item.keys())
+                    worksheet.write_row(0, 0, ["row", *headers])
+                worksheet.write_row(
+                    row_number, 0, [row_number, *[item.get(header, "") for header in headers]]
+                )
+        finally:
+            workbook.close()
         return target_path
 
     def _resolve_path(self) -> Path: